@@ -8,67 +8,134 @@ Um utilitário para clonar repositórios Git e aplicar configuração local de u
 import os
 import sys
 import json
+import shutil
 import subprocess
 import argparse
+import logging
+from functools import lru_cache
+from types import MappingProxyType
+
+# Caminho absoluto do git: junto com close_fds=False (e sem cwd=), permite que o
+# subprocess use posix_spawn() em vez de fork()+exec()
+GIT = shutil.which("git") or "git"
+
+# Quando importado pelo git_mass_clone, as mensagens seguem a configuração de logging dele
+log = logging.getLogger("gitclone")
+
+# Diretório onde o script está localizado, calculado uma única vez na importação
+_SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
 
-# Determina o diretório onde o script está localizado
 def get_script_dir():
-    return os.path.dirname(os.path.realpath(__file__))
+    return _SCRIPT_DIR
 
-# Carrega o arquivo de configuração sempre do diretório do script
+# Carrega o arquivo de configuração sempre do diretório do script.
+# O resultado é memoizado por nome de arquivo (o git_mass_clone importa este módulo e
+# pode consultá-lo várias vezes na mesma execução); por ser compartilhado, é devolvido
+# como um mapeamento somente leitura.
+@lru_cache(maxsize=4)
 def load_config(filename="config.json"):
     script_dir = get_script_dir()
     config_path = os.path.join(script_dir, filename)
     if not os.path.isfile(config_path):
-        print(f"Erro: Arquivo de configuração não encontrado: {config_path}")
+        log.error(f"Erro: Arquivo de configuração não encontrado: {config_path}")
         return None
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            return MappingProxyType(json.load(f))
     except json.JSONDecodeError as e:
-        print(f"Erro: Falha ao ler o JSON de configuração em {config_path}: {e}")
+        log.error(f"Erro: Falha ao ler o JSON de configuração em {config_path}: {e}")
         return None
     except Exception as e:
-        print(f"Erro inesperado ao carregar a configuração: {e}")
+        log.error(f"Erro inesperado ao carregar a configuração: {e}")
         return None
 
-def clone_repo(repo_url, dest_dir):
-    print(f"Clonando repositório '{repo_url}' em '{dest_dir}'...")
+def build_clone_options(jobs=None, partial=False, depth=None, reference=None):
+    """Monta as opções do `git clone`: submódulos em paralelo e, opcionalmente, clone parcial/raso e repositório de referência."""
+    # --jobs permite que o git busque os submódulos em paralelo
+    options = ["--recurse-submodules", f"--jobs={jobs or os.cpu_count() or 1}"]
+    if partial:
+        # Clone parcial: o histórico vem completo, mas os blobs só são baixados quando necessários
+        options.append("--filter=blob:none")
+    if depth:
+        # --depth implica --single-branch; --no-single-branch mantém todas as branches remotas
+        options += [f"--depth={depth}", "--no-single-branch"]
+    if reference:
+        # Os objetos já presentes no repositório de referência são copiados do disco local em vez de
+        # baixados; --dissociate deixa o clone independente da referência ao final
+        options += ["--reference-if-able", reference, "--dissociate"]
+    return options
+
+# `log_prefix` (ex.: "[cliente/classe/projeto/repo] ") identifica as mensagens quando o
+# git_mass_clone clona vários repositórios em paralelo
+def clone_repo(repo_url, dest_dir, jobs=None, partial=False, depth=None, reference=None, log_prefix=""):
+    log.info(f"{log_prefix}Clonando repositório '{repo_url}' em '{dest_dir}'...")
+    clone_options = build_clone_options(jobs=jobs, partial=partial, depth=depth, reference=reference)
     try:
-        subprocess.run(["git", "clone", repo_url, dest_dir], check=True, capture_output=True)
-        print("Repositório clonado com sucesso.")
+        # Só o stderr é usado (em caso de falha); o stdout é descartado sem passar pelo Python
+        subprocess.run([GIT, "clone", *clone_options, repo_url, dest_dir],
+                       check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, close_fds=False)
+        log.info(f"{log_prefix}Repositório clonado com sucesso.")
         return True
     except subprocess.CalledProcessError as e:
-        print("Erro: Falha ao clonar o repositório.")
-        print(f"Comando: {' '.join(e.cmd)}")
-        print(f"Stderr: {e.stderr.decode().strip()}")
+        # Uma única mensagem, para não ser intercalada com a saída de outras threads
+        log.error(f"{log_prefix}Erro: Falha ao clonar o repositório.\n"
+                  f"Comando: {' '.join(e.cmd)}\n"
+                  f"Stderr: {e.stderr.decode().strip()}")
         return False
     except FileNotFoundError:
-        print("Erro: Comando 'git' não encontrado. Certifique-se de que o Git está instalado e no PATH.")
+        log.error(f"{log_prefix}Erro: Comando 'git' não encontrado. Certifique-se de que o Git está instalado e no PATH.")
         return False
 
-def apply_git_config(dest_dir, user_name, user_email):
+def _quote_config_value(value):
+    """Formata um valor para o .git/config, entre aspas e com os escapes aceitos pelo git."""
+    escaped = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return f'"{escaped}"'
+
+def apply_git_config(dest_dir, user_name, user_email, log_prefix=""):
     git_dir = os.path.join(dest_dir, '.git')
 
     if not os.path.isdir(git_dir):
-        print(f"Erro: Diretório .git não encontrado em '{dest_dir}'. O clone falhou ou este não é um repositório Git.")
+        log.error(f"{log_prefix}Erro: Diretório .git não encontrado em '{dest_dir}'. O clone falhou ou este não é um repositório Git.")
         return False
 
-    print(f"Aplicando configuração Git local: name='{user_name}', email='{user_email}'")
+    log.info(f"{log_prefix}Aplicando configuração Git local: name='{user_name}', email='{user_email}'")
+    # Uma única escrita no .git/config equivale a `git config --local user.name/user.email`,
+    # sem o custo de iniciar dois processos git por repositório
+    config_path = os.path.join(git_dir, 'config')
     try:
-        subprocess.run(["git", "config", "--local", "user.name", user_name], cwd=dest_dir, check=True, capture_output=True)
-        subprocess.run(["git", "config", "--local", "user.email", user_email], cwd=dest_dir, check=True, capture_output=True)
-        print("Configuração Git local aplicada com sucesso.")
+        with open(config_path, 'a', encoding='utf-8') as f:
+            f.write(f"[user]\n"
+                    f"\tname = {_quote_config_value(user_name)}\n"
+                    f"\temail = {_quote_config_value(user_email)}\n")
+        log.info(f"{log_prefix}Configuração Git local aplicada com sucesso.")
         return True
-    except subprocess.CalledProcessError as e:
-        print("Erro: Falha ao aplicar a configuração Git local.")
-        print(f"Comando: {' '.join(e.cmd)}")
-        print(f"Stderr: {e.stderr.decode().strip()}")
-        return False
-    except FileNotFoundError:
-        print("Erro: Comando 'git' não encontrado durante a configuração.")
+    except OSError as e:
+        log.error(f"{log_prefix}Erro: Falha ao aplicar a configuração Git local.\n"
+                  f"Arquivo: {config_path}\n"
+                  f"Erro: {e}")
         return False
 
+def resolve_git_identity(config, cliente):
+    """Retorna a tupla (name, email) configurada para o cliente, ou None se incompleta."""
+    git_user_name = config.get('gitUserName')
+    clientes = config.get('clientes', {})
+    cliente_info = clientes.get(cliente)
+
+    if not git_user_name:
+        log.error("Erro: 'gitUserName' não encontrado ou vazio no config.json.")
+        return None
+
+    if not cliente_info:
+        log.error(f"Erro: Cliente '{cliente}' não encontrado na seção 'clientes' do config.json.")
+        return None
+
+    git_email = cliente_info.get('gitEmail')
+    if not git_email:
+        log.error(f"Erro: 'gitEmail' não encontrado para o cliente '{cliente}' no config.json.")
+        return None
+
+    return git_user_name, git_email
+
 def main():
     parser = argparse.ArgumentParser(
         description='Clona um repositório Git e opcionalmente aplica configuração local de usuário (name/email) baseada em um cliente.',
@@ -79,6 +146,31 @@ def main():
         help='Nome do cliente (definido em config.json) para buscar o email correspondente.',
         required=False
     )
+    parser.add_argument(
+        '-j', '--git-jobs',
+        type=int,
+        default=os.cpu_count() or 1,
+        metavar='N',
+        help='Número de submódulos buscados em paralelo pelo git (padrão: número de CPUs).'
+    )
+    parser.add_argument(
+        '--partial',
+        action='store_true',
+        help='Faz um clone parcial (--filter=blob:none): os arquivos são baixados sob demanda, reduzindo\n'
+             'o volume transferido e o espaço em disco.'
+    )
+    parser.add_argument(
+        '--shallow',
+        type=int,
+        metavar='N',
+        help='Faz um clone raso, com apenas os últimos N commits de cada branch (--depth=N).'
+    )
+    parser.add_argument(
+        '--reference',
+        metavar='DIR',
+        help='Repositório local (ex.: um espelho `git clone --mirror`) do qual reaproveitar objetos já baixados\n'
+             '(--reference-if-able DIR --dissociate).'
+    )
     parser.add_argument(
         'repo_url',
         metavar='url-do-repositorio',
@@ -91,41 +183,30 @@ def main():
     )
 
     args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
 
     # 1. Clonar o repositório
-    if not clone_repo(args.repo_url, args.dest_dir):
+    if not clone_repo(args.repo_url, args.dest_dir, jobs=args.git_jobs, partial=args.partial, depth=args.shallow,
+                      reference=args.reference):
         sys.exit(1)
 
     # 2. Se um cliente foi especificado, tentar aplicar a configuração
     if args.cliente:
-        print(f"Tentando aplicar configuração para o cliente: '{args.cliente}'")
+        log.info(f"Tentando aplicar configuração para o cliente: '{args.cliente}'")
         config = load_config()
         if config is None:
-            print("Não foi possível carregar a configuração. A configuração local do Git não será aplicada.")
-            sys.exit(1)
-
-        git_user_name = config.get('gitUserName')
-        clientes = config.get('clientes', {})
-        cliente_info = clientes.get(args.cliente)
-
-        if not git_user_name:
-            print("Erro: 'gitUserName' não encontrado ou vazio no config.json.")
-            sys.exit(1)
-
-        if not cliente_info:
-            print(f"Erro: Cliente '{args.cliente}' não encontrado na seção 'clientes' do config.json.")
+            log.error("Não foi possível carregar a configuração. A configuração local do Git não será aplicada.")
             sys.exit(1)
 
-        git_email = cliente_info.get('gitEmail')
-        if not git_email:
-            print(f"Erro: 'gitEmail' não encontrado para o cliente '{args.cliente}' no config.json.")
+        git_identity = resolve_git_identity(config, args.cliente)
+        if git_identity is None:
             sys.exit(1)
 
         # Aplicar a configuração
-        if not apply_git_config(args.dest_dir, git_user_name, git_email):
+        if not apply_git_config(args.dest_dir, *git_identity):
             sys.exit(1)
     else:
-        print("Nenhum cliente especificado. O repositório foi clonado sem configuração local de usuário/email.")
+        log.info("Nenhum cliente especificado. O repositório foi clonado sem configuração local de usuário/email.")
 
 if __name__ == '__main__':
     main()
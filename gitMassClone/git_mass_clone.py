@@ -12,15 +12,57 @@ import os
 import sys
 import subprocess
 import argparse
+import hashlib
+import importlib.machinery
+import importlib.util
+import logging
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Any
 
-import yaml
 import json
-import re
 import shutil
 
+# orjson (opcional) serializa o relatório bem mais rápido que o json da biblioteca padrão
+try:
+    import orjson
+
+    def _dump_report(report):
+        return orjson.dumps(report, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS).decode('utf-8')
+except ImportError:
+    def _dump_report(report):
+        return json.dumps(report, indent=4, ensure_ascii=False, sort_keys=True)
+
 # Variável global para armazenar o relatório de problemas
 checkout_report = {}
+# Os repositórios são processados em threads paralelas; o lock protege o relatório
+_report_lock = threading.Lock()
+
+# Toda a saída passa pelo logging: o handler serializa as mensagens das threads de trabalho,
+# evitando linhas intercaladas
+log = logging.getLogger("git_mass_clone")
+
+DEFAULT_JOBS = 8
+
+# Caminho absoluto do git: junto com close_fds=False, permite que o subprocess use
+# posix_spawn() em vez de fork()+exec() nas centenas de chamadas git de uma execução
+GIT = shutil.which("git") or "git"
+
+# Calculados uma única vez na importação: diretório real deste script (onde fica o repos.yaml)
+# e o comando `gitclone` no PATH, se houver
+_SCRIPT_DIR = os.path.dirname(os.path.realpath(__file__))
+_GITCLONE_CMD = shutil.which("gitclone")
+
+# Diretório padrão do cache de espelhos usado por --reference-cache
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                                 'env-config', 'gitcache')
+# Um lock por URL impede que duas threads criem/atualizem o mesmo espelho ao mesmo tempo;
+# cada espelho é atualizado no máximo uma vez por execução
+_mirror_locks = {}
+_mirror_locks_lock = threading.Lock()
+_updated_mirrors = set()
 
 
 def parse_args():
@@ -37,66 +79,223 @@ def parse_args():
     parser.add_argument(
         "--delete-gone-branches",
         action="store_true",
-        help="Remove automaticamente branches locais que foram removidas na origem (`git remote prune origin` já é executado)."
+        help="Remove automaticamente branches locais que foram removidas na origem (as refs remotas apagadas já são removidas pelo `--prune` do pull/fetch)."
+    )
+    parser.add_argument(
+        "-j", "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        metavar="N",
+        help=f"Número de repositórios processados em paralelo (padrão: {DEFAULT_JOBS})."
+    )
+    parser.add_argument(
+        "--git-jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        metavar="N",
+        help="Número de submódulos buscados em paralelo pelo git em cada clone/fetch (padrão: número de CPUs)."
+    )
+    parser.add_argument(
+        "--partial",
+        action="store_true",
+        help="Faz clones parciais (--filter=blob:none) dos novos repositórios: os arquivos são baixados\n"
+             "sob demanda, reduzindo o volume transferido e o espaço em disco."
+    )
+    parser.add_argument(
+        "--shallow",
+        type=int,
+        metavar="N",
+        help="Faz clones rasos dos novos repositórios, com apenas os últimos N commits de cada branch (--depth=N)."
+    )
+    parser.add_argument(
+        "--max-age",
+        type=int,
+        default=0,
+        metavar="SEGUNDOS",
+        help="Pula repositórios já existentes cujo último fetch ocorreu há menos de SEGUNDOS segundos\n"
+             "(baseado no mtime de .git/FETCH_HEAD). O padrão 0 sempre atualiza."
+    )
+    parser.add_argument(
+        "--reference-cache",
+        nargs="?",
+        type=os.path.abspath,
+        const=DEFAULT_CACHE_DIR,
+        metavar="DIR",
+        help="Mantém em DIR um espelho (`git clone --mirror`) de cada URL clonada e clona os novos repositórios\n"
+             "a partir dele (--reference-if-able --dissociate): clones repetidos da mesma URL copiam os\n"
+             f"objetos do disco local em vez de baixá-los (DIR padrão: {DEFAULT_CACHE_DIR}).\n"
+             "Não é usado em clones parciais ou rasos (--partial/--shallow, partialClone/shallow)."
     )
     # O argumento do arquivo de configuração foi removido
     return parser.parse_args()
 
 
+def _read_cached_config(cache_path, source_stat):
+    """Lê o JSON gerado a partir do YAML, se ele foi gerado exatamente desta versão do YAML; caso contrário retorna None.
+
+    A versão é identificada pelo mtime (em ns) e pelo tamanho do YAML gravados no cache: comparar
+    apenas "cache mais novo que o YAML" falharia quando o YAML é restaurado com um mtime antigo
+    (cp -p, rsync, tar, backups).
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(cached, dict) or cached.get('mtime_ns') != source_stat.st_mtime_ns
+            or cached.get('size') != source_stat.st_size):
+        return None
+    return cached.get('config')
+
+
+def _write_cached_config(cache_path, source_stat, config):
+    """Grava a configuração em JSON de forma atômica. Falhas são ignoradas (o cache é opcional).
+
+    O cache só é gravado se o JSON reproduz exatamente os dados do YAML (chaves numéricas,
+    datas etc. não sobrevivem à conversão e mudariam o comportamento da execução seguinte).
+    """
+    try:
+        serialized = json.dumps(config, ensure_ascii=False)
+        if json.loads(serialized) != config:
+            return
+        cached = json.dumps({'mtime_ns': source_stat.st_mtime_ns, 'size': source_stat.st_size,
+                             'config': config}, ensure_ascii=False)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(cached)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception:
+        pass
+
+
 def load_config(filename="repos.yaml"):
     """Carrega a configuração do arquivo repos.yaml no diretório do script."""
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    config_path = os.path.join(script_dir, filename)
+    config_path = os.path.join(_SCRIPT_DIR, filename)
 
     if not os.path.isfile(config_path):
-        print(f"Erro: Arquivo de configuração padrão não encontrado: {config_path}")
+        log.error(f"Erro: Arquivo de configuração padrão não encontrado: {config_path}")
         sys.exit(1)
 
-    print(f"INFO: Carregando configuração de {config_path}")
+    log.info(f"INFO: Carregando configuração de {config_path}")
+    # O parse de JSON é muito mais rápido que o de YAML: após o primeiro parse, a configuração
+    # é gravada ao lado do YAML e reaproveitada enquanto o YAML não for modificado
+    cache_path = config_path + '.cache.json'
+    try:
+        source_stat = os.stat(config_path)
+    except OSError as e:
+        log.error(f"Erro ao ler o arquivo YAML: {e}")
+        sys.exit(1)
+    config = _read_cached_config(cache_path, source_stat)
+    if config is not None:
+        return config
+
+    # Importado só quando o YAML precisa ser parseado: com o cache válido, o import do PyYAML
+    # (dezenas de milissegundos) fica fora da inicialização
+    try:
+        import yaml
+    except ImportError:
+        log.error("Erro: Biblioteca PyYAML não encontrada. Instale com `pip install pyyaml`.")
+        sys.exit(1)
+    # Usa o loader em C (LibYAML) quando o PyYAML foi compilado com ele; cerca de 10x mais rápido
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
     try:
         with open(config_path, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f)
+            config = yaml.load(f, Loader=loader)
     except yaml.YAMLError as e:
-        print(f"Erro ao ler o arquivo YAML: {e}")
+        log.error(f"Erro ao ler o arquivo YAML: {e}")
         sys.exit(1)
     except Exception as e:
-        print(f"Erro inesperado ao carregar configuração: {e}")
+        log.error(f"Erro inesperado ao carregar configuração: {e}")
         sys.exit(1)
 
+    _write_cached_config(cache_path, source_stat, config)
+    return config
+
 
-def check_gitclone_command():
-    """Verifica se o comando `gitclone` está disponível no PATH."""
-    gitclone_path = shutil.which("gitclone")
-    if gitclone_path:
-        print(f"INFO: Comando `gitclone` encontrado em: {gitclone_path}")
-        return "gitclone"  # Retorna o nome do comando para ser usado
+def find_gitclone_scripts():
+    """Lista os candidatos a clone_and_configure.py: o comando `gitclone` no PATH e o script do diretório irmão."""
+    candidates = []
+    if _GITCLONE_CMD:
+        log.info(f"INFO: Comando `gitclone` encontrado em: {_GITCLONE_CMD}")
+        candidates.append(os.path.realpath(_GITCLONE_CMD))
     else:
-        print("AVISO: Comando `gitclone` não encontrado no PATH.")
-        print("Buscando script...")
-        return find_gitclone_script()
-
-
-def find_gitclone_script():
-    """Encontra o caminho para o script clone_and_configure.py."""
-    script_dir = os.path.dirname(os.path.realpath(__file__))
-    gitclone_script_path = os.path.abspath(os.path.join(script_dir, '..', 'gitClone', 'clone_and_configure.py'))
-    if not os.path.isfile(gitclone_script_path):
-        print(f"AVISO: Script 'clone_and_configure.py' não encontrado em {os.path.dirname(gitclone_script_path)}")
-        print("A configuração específica do cliente não será aplicada.")
-        print("O clone será feito usando `git clone` padrão, sem configuração específica do cliente.")
-        return None
-    if not os.access(gitclone_script_path, os.X_OK):
-        print(f"AVISO: Script '{gitclone_script_path}' não tem permissão de execução.")
-        print("Tentando adicionar permissão de execução...")
+        log.warning("AVISO: Comando `gitclone` não encontrado no PATH.")
+
+    # O script irmão também é candidato quando o `gitclone` do PATH não pode ser importado
+    # (ex.: um wrapper em shell que chama o clone_and_configure.py)
+    gitclone_script_path = os.path.abspath(os.path.join(_SCRIPT_DIR, '..', 'gitClone', 'clone_and_configure.py'))
+    if os.path.isfile(gitclone_script_path):
+        if gitclone_script_path not in candidates:
+            candidates.append(gitclone_script_path)
+    elif not candidates:
+        log.warning(f"AVISO: Script 'clone_and_configure.py' não encontrado em {os.path.dirname(gitclone_script_path)}")
+    return candidates
+
+
+def load_gitclone_module():
+    """Importa o clone_and_configure.py como módulo, para clonar sem iniciar um novo interpretador por repositório."""
+    for gitclone_script_path in find_gitclone_scripts():
         try:
-            os.chmod(gitclone_script_path, 0o755)
-            print("Permissão de execução adicionada.")
-        except OSError as e:
-            print(f"Erro ao adicionar permissão de execução: {e}")
-            print("A configuração específica do cliente não será aplicada.")
-            print("O clone será feito usando `git clone` padrão, sem configuração específica do cliente.")
-            return None
-    return gitclone_script_path
+            # SourceFileLoader aceita o script mesmo sem a extensão .py (ex.: cópia chamada `gitclone`)
+            loader = importlib.machinery.SourceFileLoader('clone_and_configure', gitclone_script_path)
+            spec = importlib.util.spec_from_loader(loader.name, loader)
+            module = importlib.util.module_from_spec(spec)
+            loader.exec_module(module)
+            return module
+        except Exception as e:
+            log.warning(f"AVISO: Não foi possível carregar '{gitclone_script_path}': {e}")
+
+    if _GITCLONE_CMD:
+        log.warning(f"AVISO: O clone será feito executando o comando `{_GITCLONE_CMD}` para cada novo repositório.")
+    else:
+        log.warning("A configuração específica do cliente não será aplicada.")
+        log.warning("O clone será feito usando `git clone` padrão, sem configuração específica do cliente.")
+    return None
+
+
+def load_git_identities(gitclone, clientes):
+    """Resolve, uma única vez por cliente, o (name, email) definido no config.json do gitclone."""
+    if gitclone is None:
+        return {}
+    gitclone_config = gitclone.load_config()
+    if gitclone_config is None:
+        log.warning("AVISO: A configuração local de usuário/email não será aplicada aos novos clones.")
+        return {}
+
+    git_identities = {}
+    for cliente_name, _ in clientes:
+        git_identity = gitclone.resolve_git_identity(gitclone_config, cliente_name)
+        if git_identity is None:
+            log.warning(f"AVISO: Novos clones do cliente '{cliente_name}' não receberão configuração local de usuário/email.")
+        git_identities[cliente_name] = git_identity
+    return git_identities
+
+
+def load_clone_settings(clientes, partial, depth):
+    """Resolve, por cliente, o (partial, depth) dos novos clones.
+
+    `partialClone` e `shallow` definidos no cliente (repos.yaml) têm precedência sobre --partial/--shallow.
+    """
+    clone_settings = {}
+    for cliente_name, cliente_data in clientes:
+        if not isinstance(cliente_data, dict):
+            continue
+        cliente_partial = bool(cliente_data.get('partialClone', partial))
+        cliente_depth = cliente_data.get('shallow', depth)
+        if cliente_depth is False:
+            cliente_depth = None  # `shallow: false` desativa o clone raso mesmo com --shallow
+        elif cliente_depth is not None and (isinstance(cliente_depth, bool) or not isinstance(cliente_depth, int)
+                                            or cliente_depth < 0):
+            log.warning(f"AVISO: Valor inválido para 'shallow' no cliente '{cliente_name}': {cliente_depth!r}. "
+                        f"Usando o valor da linha de comando.")
+            cliente_depth = depth
+        clone_settings[cliente_name] = (cliente_partial, cliente_depth)
+    return clone_settings
 
 
 def filter_clientes(all_clientes, args):
@@ -104,257 +303,377 @@ def filter_clientes(all_clientes, args):
         return all_clientes.items()
     else:
         selected_names = {c.strip() for c in args.cliente.split(',')}
-        filtered = {}
-        not_found = set()
-        for name in selected_names:
-            if name in all_clientes:
-                filtered[name] = all_clientes[name]
-            else:
-                not_found.add(name)
+        filtered = {name: all_clientes[name] for name in selected_names & all_clientes.keys()}
+        not_found = selected_names - all_clientes.keys()
         if not_found:
-            print(
-                f"Aviso: Cliente(s) não encontrado(s) no arquivo de configuração: {', '.join(sorted(list(not_found)))}")
+            log.warning(
+                f"Aviso: Cliente(s) não encontrado(s) no arquivo de configuração: {', '.join(sorted(not_found))}")
         if not filtered:
-            print("Nenhum dos clientes especificados foi encontrado. Saindo.")
+            log.error("Nenhum dos clientes especificados foi encontrado. Saindo.")
             sys.exit(1)
         return filtered.items()
 
 
 def _add_to_report(repo_identifier, type, branch_name):
     """Adiciona uma entrada ao relatório global."""
-    if repo_identifier not in checkout_report:
-        checkout_report[repo_identifier] = {}
-    if type not in checkout_report[repo_identifier]:
-        checkout_report[repo_identifier][type] = []
-    if branch_name not in checkout_report[repo_identifier][type]:
-        checkout_report[repo_identifier][type].append(branch_name)
+    with _report_lock:
+        # Conjuntos eliminam duplicatas sem busca linear; viram listas ordenadas só na impressão
+        checkout_report.setdefault(repo_identifier, {}).setdefault(type, set()).add(branch_name)
 
 
-def run_git_command(repo_dir, *args, check=False, suppress_stderr=False, ignore_errors=False):
-    """Executa um comando git no diretório especificado."""
-    command = ['git', '-C', repo_dir] + list(args)
+def run_git_command(repo_dir, *args, check=False, suppress_stderr=False, ignore_errors=False, capture=True):
+    """Executa um comando git no diretório especificado.
+
+    O stdout é retornado em bytes (quem precisa dele decodifica) ou, com capture=False,
+    descartado direto para /dev/null sem passar pelo Python (result.stdout fica None).
+    O stderr só é decodificado quando o comando falha, que é o único caso em que é usado.
+    """
+    command = [GIT, '-C', repo_dir] + list(args)
+    stdout = subprocess.PIPE if capture else subprocess.DEVNULL
     try:
-        result = subprocess.run(command, capture_output=True, text=True, check=check, encoding='utf-8')
+        result = subprocess.run(command, stdout=stdout, stderr=subprocess.PIPE, check=check, close_fds=False)
+        if result.returncode != 0:
+            result.stderr = result.stderr.decode('utf-8', 'replace')
         return result
     except FileNotFoundError:
-        print("Erro: Comando 'git' não encontrado. Verifique se o Git está instalado e no PATH.")
+        log.error("Erro: Comando 'git' não encontrado. Verifique se o Git está instalado e no PATH.")
         sys.exit(1)
     except subprocess.CalledProcessError as e:
+        e.stderr = e.stderr.decode('utf-8', 'replace')
         if not suppress_stderr and not ignore_errors:
-            print(f"Erro ao executar git {' '.join(args)} em {repo_dir}: {e.stderr.strip()}")
+            log.error(f"Erro ao executar git {' '.join(args)} em {repo_dir}: {e.stderr.strip()}")
         return e
     except Exception as e:
         if not ignore_errors:
-            print(f"Erro inesperado ao executar git {' '.join(args)} em {repo_dir}: {e}")
+            log.error(f"Erro inesperado ao executar git {' '.join(args)} em {repo_dir}: {e}")
         # Retorna um objeto simulado com código de retorno diferente de zero
-        return subprocess.CompletedProcess(args=command, returncode=1, stdout="", stderr=str(e))
+        return subprocess.CompletedProcess(args=command, returncode=1, stdout=b"", stderr=str(e))
 
 
-def _fetch_and_prune(repo_dir, repo_identifier):
-    """Executa git fetch --prune e remote prune origin."""
-    print(f"[{repo_identifier}] Executando fetch --prune e remote prune...")
-    run_git_command(repo_dir, 'remote', 'prune', 'origin', ignore_errors=True)  # Ignora erro se origin não existir
-    fetch_result = run_git_command(repo_dir, 'fetch', '--prune')
+def _fetch_and_prune(repo_dir, repo_identifier, git_jobs):
+    """Executa git fetch --prune (que já remove as refs remotas apagadas, como o `git remote prune origin`)."""
+    log.info(f"[{repo_identifier}] Executando fetch --prune...")
+    fetch_result = run_git_command(repo_dir, 'fetch', '--prune', f'--jobs={git_jobs}', capture=False)
     if fetch_result.returncode != 0:
-        print(f"[{repo_identifier}] Aviso: Falha ao executar 'git fetch --prune'. {fetch_result.stderr.strip()}")
+        log.warning(f"[{repo_identifier}] Aviso: Falha ao executar 'git fetch --prune'. {fetch_result.stderr.strip()}")
         _add_to_report(repo_identifier, 'branches-com-falha', fetch_result.stderr.strip())
         return False
     return True
 
 
-def _get_remote_branches(repo_dir, repo_identifier):
-    """Obtém a lista de branches remotas (origin/*)."""
-    remote_branches_result = run_git_command(repo_dir, 'branch', '-r')
-    if remote_branches_result.returncode != 0:
-        print(f"[{repo_identifier}] Erro: Não foi possível listar branches remotas.")
+def _get_branches(repo_dir, repo_identifier):
+    """Lê, em uma única chamada ao git, a branch atual, as branches remotas (origin/*) e as locais.
+
+    Retorna (branch_atual, branches_remotas, branches_locais), ou None em caso de falha.
+    `branch_atual` é None com HEAD destacado e `branches_locais` é {branch: (upstream, estado)}, onde
+    `upstream` é a ref completa rastreada (ex.: refs/remotes/origin/main, ou '' se não houver) e `estado`
+    é o %(upstream:track) do git: '' em dia, '[behind N]', '[ahead N]', '[ahead N, behind M]' ou '[gone]'.
+    """
+    # A saída do for-each-ref não é traduzida, então o estado pode ser comparado diretamente
+    branches_result = run_git_command(repo_dir, 'for-each-ref',
+                                      '--format=%(HEAD)%09%(refname)%09%(upstream)%09%(upstream:track)',
+                                      'refs/heads/', 'refs/remotes/origin/')
+    if branches_result.returncode != 0:
+        log.error(f"[{repo_identifier}] Erro: Não foi possível listar as branches.")
         return None
 
+    current_branch = None
     remote_branches = set()
-    for line in remote_branches_result.stdout.splitlines():
-        line = line.strip()
-        if line.startswith('origin/') and '->' not in line:
-            branch_name = line.split('/', 1)[1]
-            remote_branches.add(branch_name)
-    return remote_branches
-
-
-def _delete_branches(branches_to_delete, repo_dir, repo_identifier):
-    print(
+    local_branches = {}
+    for line in branches_result.stdout.decode('utf-8').splitlines():
+        head, refname, upstream, track = line.split('\t')
+        if refname.startswith('refs/heads/'):
+            branch = refname[len('refs/heads/'):]
+            local_branches[branch] = (upstream, track)
+            if head == '*':
+                current_branch = branch
+        elif refname != 'refs/remotes/origin/HEAD':
+            # Sem o alias "origin/HEAD -> ..."
+            remote_branches.add(refname[len('refs/remotes/origin/'):])
+    return current_branch, remote_branches, local_branches
+
+
+def _delete_branches(branches_to_delete, repo_dir, repo_identifier, current_branch):
+    log.info(
         f"[{repo_identifier}] Removendo branches locais (--delete-gone-branches ativo): {', '.join(branches_to_delete)}")
-    for local_branch in branches_to_delete:
-        # Verificar se não é a branch atual antes de deletar
-        current_branch_result = run_git_command(repo_dir, 'rev-parse', '--abbrev-ref', 'HEAD')
-        if current_branch_result.returncode == 0 and current_branch_result.stdout.strip() == local_branch:
-            print(
-                f"[{repo_identifier}] Aviso: Não é possível remover a branch atual '{local_branch}'. Mude para outra branch primeiro.")
-            _add_to_report(repo_identifier, 'branches-com-falha', local_branch)
-            continue
+    # A branch atual não pode ser deletada
+    if current_branch in branches_to_delete:
+        log.warning(
+            f"[{repo_identifier}] Aviso: Não é possível remover a branch atual '{current_branch}'. Mude para outra branch primeiro.")
+        _add_to_report(repo_identifier, 'branches-com-falha', current_branch)
+        branches_to_delete = [b for b in branches_to_delete if b != current_branch]
+    if not branches_to_delete:
+        return
 
-        delete_result = run_git_command(repo_dir, 'branch', '-d', local_branch)
-        if delete_result.returncode != 0:
-            print(f"[{repo_identifier}] Falha ao remover branch local '{local_branch}'. Tentando com -D...")
-            delete_result_force = run_git_command(repo_dir, 'branch', '-D', local_branch)
-            if delete_result_force.returncode != 0:
-                print(
-                    f"[{repo_identifier}] Erro ao forçar remoção da branch local '{local_branch}': {delete_result_force.stderr.strip()}")
-                _add_to_report(repo_identifier, 'branches-com-falha', local_branch)
+    # Um único `git branch -D` remove todas as branches; se alguma falhar, as demais são removidas mesmo assim
+    delete_result = run_git_command(repo_dir, 'branch', '-D', *branches_to_delete, capture=False)
+    if delete_result.returncode == 0:
+        return
 
+    # Descobrir quais branches continuam existindo, sem depender do texto (traduzido) da mensagem de erro
+    remaining_result = run_git_command(repo_dir, 'for-each-ref', '--format=%(refname:lstrip=2)',
+                                       *(f'refs/heads/{b}' for b in branches_to_delete))
+    if remaining_result.returncode == 0:
+        remaining = set(remaining_result.stdout.decode('utf-8').splitlines())
+        failed_branches = [b for b in branches_to_delete if b in remaining]
+    else:
+        failed_branches = branches_to_delete
+    log.error(
+        f"[{repo_identifier}] Erro ao forçar remoção das branches locais {', '.join(failed_branches)}: {delete_result.stderr.strip()}")
+    for local_branch in failed_branches:
+        _add_to_report(repo_identifier, 'branches-com-falha', local_branch)
 
-def _handle_gone_branches(repo_dir, repo_identifier, delete_gone_branches_flag):
-    """Identifica e opcionalmente remove branches locais cujo upstream foi removido."""
-    local_branches_result = run_git_command(repo_dir, 'branch', '-vv')
-    if local_branches_result.returncode != 0:
-        print(
-            f"[{repo_identifier}] Aviso: Não foi possível executar 'git branch -vv'. Não foi possível verificar branches 'gone'.")
-        return
 
-    gone_branch_pattern = re.compile(r"^\*?\s+(\S+)\s+\S+\s+\[origin/(\S+): gone\]")
+def _handle_gone_branches(repo_dir, repo_identifier, local_branches, current_branch, delete_gone_branches_flag):
+    """Identifica e opcionalmente remove branches locais cujo upstream foi removido."""
+    # O git informa literalmente "[gone]" quando a ref rastreada deixou de existir
     branches_to_delete = []
-    for line in local_branches_result.stdout.splitlines():
-        match = gone_branch_pattern.search(line)
-        if match:
-            local_branch = match.group(1)
-            remote_branch_name = match.group(2)
-            print(
-                f"[{repo_identifier}] Branch remota 'origin/{remote_branch_name}' (rastreada por '{local_branch}') foi removida.")
-            _add_to_report(repo_identifier, 'branches-removidas', remote_branch_name)
-            if delete_gone_branches_flag:
-                branches_to_delete.append(local_branch)
+    for local_branch, (upstream, track) in local_branches.items():
+        if track != '[gone]' or not upstream.startswith('refs/remotes/origin/'):
+            continue
+        remote_branch_name = upstream[len('refs/remotes/origin/'):]
+        log.info(
+            f"[{repo_identifier}] Branch remota 'origin/{remote_branch_name}' (rastreada por '{local_branch}') foi removida.")
+        _add_to_report(repo_identifier, 'branches-removidas', remote_branch_name)
+        if delete_gone_branches_flag:
+            branches_to_delete.append(local_branch)
 
     if branches_to_delete:
-        _delete_branches(branches_to_delete, repo_dir, repo_identifier)
-
-
-def _checkout_remote_branch(repo_dir, repo_identifier, branch):
-    """Tenta fazer checkout de uma branch remota, criando-a localmente se necessário."""
-    print(f"[{repo_identifier}] Verificando branch '{branch}'...")
-    checkout_result = run_git_command(repo_dir, 'checkout', branch, suppress_stderr=True, ignore_errors=True)
-    if checkout_result.returncode != 0:
-        track_result = run_git_command(repo_dir, 'checkout', '--track', f'origin/{branch}', suppress_stderr=True)
-        if track_result.returncode != 0:
-            error_msg = track_result.stderr.strip() if hasattr(track_result, 'stderr') else "Erro desconhecido"
-            print(f"[{repo_identifier}] Falha ao fazer checkout da branch '{branch}'. Erro: {error_msg}")
-            _add_to_report(repo_identifier, 'branches-com-falha', branch)
-            return False
+        _delete_branches(branches_to_delete, repo_dir, repo_identifier, current_branch)
+
+
+def _track_remote_branch(repo_dir, repo_identifier, branch):
+    """Cria a branch local rastreando origin/<branch>, sem alterar o working tree."""
+    log.info(f"[{repo_identifier}] Criando branch local '{branch}' rastreando 'origin/{branch}'...")
+    track_result = run_git_command(repo_dir, 'branch', '--track', branch, f'origin/{branch}', suppress_stderr=True,
+                                   capture=False)
+    if track_result.returncode != 0:
+        error_msg = track_result.stderr.strip() if hasattr(track_result, 'stderr') else "Erro desconhecido"
+        log.warning(f"[{repo_identifier}] Falha ao criar a branch '{branch}'. Erro: {error_msg}")
+        _add_to_report(repo_identifier, 'branches-com-falha', branch)
+        return False
     return True
 
 
-def _return_to_original_branch(repo_dir, repo_identifier, original_branch):
-    """Retorna para a branch original ou uma branch padrão (main/master)."""
-    checkout_success = False
-    if original_branch and original_branch != 'HEAD':
-        print(f"[{repo_identifier}] Retornando para branch original '{original_branch}'...")
-        result = run_git_command(repo_dir, 'checkout', original_branch, ignore_errors=True)
-        if result.returncode == 0:
-            checkout_success = True
+def _fast_forward_branches(repo_dir, repo_identifier, local_branches, current_branch):
+    """Avança (apenas fast-forward) as branches locais que ficaram atrás do upstream em origin.
 
-    if not checkout_success:
-        for default_branch in ('main', 'master'):
-            print(f"[{repo_identifier}] Tentando retornar para branch padrão '{default_branch}'...")
-            result = run_git_command(repo_dir, 'checkout', default_branch, ignore_errors=True)
-            if result.returncode == 0:
-                checkout_success = True
-                print(f"[{repo_identifier}] Retornou para '{default_branch}'.")
-                break
+    Usa um único `git fetch .` a partir das refs remotas já atualizadas: não acessa a rede
+    nem o working tree. A branch atual é ignorada, pois já foi atualizada pelo pull.
+    """
+    refspecs = [f'{upstream}:refs/heads/{branch}'
+                for branch, (upstream, track) in sorted(local_branches.items())
+                if track.startswith('[behind ') and branch != current_branch and upstream.startswith('refs/remotes/origin/')]
+    if not refspecs:
+        return
 
-    if not checkout_success:
-        print(f"[{repo_identifier}] Aviso: Não foi possível retornar para a branch original ou padrão.")
+    log.info(f"[{repo_identifier}] Avançando {len(refspecs)} branch(es) local(is) desatualizada(s)...")
+    ff_result = run_git_command(repo_dir, 'fetch', '--quiet', '.', *refspecs, suppress_stderr=True, capture=False)
+    if ff_result.returncode != 0:
+        log.warning(f"[{repo_identifier}] Aviso: Falha ao avançar branches locais. {ff_result.stderr.strip()}")
+        _add_to_report(repo_identifier, 'branches-com-falha', ff_result.stderr.strip())
 
 
 # --- Funções Refatoradas de clone_or_update ---
 
-def update_repository_branches(repo_dir, repo_identifier, delete_gone_branches_flag):
-    """Função principal que orquestra a atualização das branches e o relatório."""
-    print(f"[{repo_identifier}] Atualizando branches...")
+def update_repository_branches(repo_dir, repo_identifier, delete_gone_branches_flag, git_jobs, fetch=True):
+    """Função principal que orquestra a atualização das branches e o relatório.
 
-    current_branch_result = run_git_command(repo_dir, 'rev-parse', '--abbrev-ref', 'HEAD')
-    original_branch = current_branch_result.stdout.strip() if current_branch_result.returncode == 0 else None
+    Nenhuma etapa faz checkout: as branches são criadas e avançadas apenas como refs,
+    então o working tree e a branch atual permanecem como estavam. Com fetch=False as
+    refs remotas já estão atualizadas (clone recém-feito ou pull bem-sucedido) e o
+    fetch é pulado, evitando mais uma ida à rede.
+    """
+    log.info(f"[{repo_identifier}] Atualizando branches...")
 
-    if not _fetch_and_prune(repo_dir, repo_identifier):
-        # Se o fetch falhar, ainda tenta retornar para a branch original
-        _return_to_original_branch(repo_dir, repo_identifier, original_branch)
+    if fetch and not _fetch_and_prune(repo_dir, repo_identifier, git_jobs):
         return
 
-    remote_branches = _get_remote_branches(repo_dir, repo_identifier)
-    if remote_branches is None:
-        _return_to_original_branch(repo_dir, repo_identifier, original_branch)
+    branches = _get_branches(repo_dir, repo_identifier)
+    if branches is None:
         return  # Não pode continuar sem a lista de branches
-
-    _handle_gone_branches(repo_dir, repo_identifier, delete_gone_branches_flag)
-
-    for branch in sorted(list(remote_branches)):
-        if branch == 'HEAD': continue
-        _checkout_remote_branch(repo_dir, repo_identifier, branch)
-
-    _return_to_original_branch(repo_dir, repo_identifier, original_branch)
-
-
-def _clone_repository(repo_url, dest_dir, client_name, gitclone_command, repo_identifier):
-    """Clona o repositório usando gitclone ou git clone padrão."""
-    print(f"[{repo_identifier}] Clonando {repo_url} em {dest_dir} para o cliente '{client_name}'...")
-
-    # Garante que o diretório pai exista ANTES de tentar clonar
+    current_branch, remote_branches, local_branches = branches
+
+    _handle_gone_branches(repo_dir, repo_identifier, local_branches, current_branch, delete_gone_branches_flag)
+
+    # Só as branches remotas ainda sem branch local precisam de um subprocesso;
+    # nenhuma delas passa por checkout, então o working tree não é reescrito a cada branch
+    for branch in sorted(remote_branches - local_branches.keys()):
+        _track_remote_branch(repo_dir, repo_identifier, branch)
+
+    _fast_forward_branches(repo_dir, repo_identifier, local_branches, current_branch)
+
+
+def _ensure_cached_mirror(repo_url, cache_dir, repo_identifier):
+    """Cria ou atualiza o espelho local de `repo_url` em `cache_dir` e retorna seu caminho (None em caso de falha)."""
+    mirror_dir = os.path.join(cache_dir, hashlib.sha1(repo_url.encode('utf-8')).hexdigest() + '.git')
+    with _mirror_locks_lock:
+        lock = _mirror_locks.setdefault(mirror_dir, threading.Lock())
+
+    with lock:
+        if mirror_dir in _updated_mirrors:
+            return mirror_dir
+
+        if os.path.isdir(mirror_dir):
+            log.info(f"[{repo_identifier}] Atualizando espelho local {mirror_dir}...")
+            update_result = run_git_command(mirror_dir, 'remote', 'update', '--prune', capture=False)
+            if update_result.returncode != 0:
+                # Um espelho desatualizado ainda é útil: o que faltar é baixado do remoto pelo clone
+                log.warning(f"[{repo_identifier}] Aviso: Falha ao atualizar o espelho local: {update_result.stderr.strip()}")
+        else:
+            log.info(f"[{repo_identifier}] Criando espelho local de {repo_url} em {mirror_dir}...")
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                # Clona em um diretório temporário e renomeia: um espelho interrompido nunca fica no cache
+                tmp_dir = tempfile.mkdtemp(dir=cache_dir, prefix=os.path.basename(mirror_dir) + '.tmp-')
+            except OSError as e:
+                log.warning(f"[{repo_identifier}] Aviso: Não foi possível criar o diretório de cache {cache_dir}: {e}")
+                return None
+            mirror_result = run_git_command(cache_dir, 'clone', '--mirror', '--quiet', repo_url, tmp_dir, capture=False)
+            if mirror_result.returncode != 0:
+                log.warning(f"[{repo_identifier}] Aviso: Falha ao criar o espelho local: {mirror_result.stderr.strip()}")
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return None
+            try:
+                os.replace(tmp_dir, mirror_dir)
+            except OSError as e:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                # Outra execução pode ter criado o mesmo espelho primeiro: nesse caso ele é usado
+                if not os.path.isdir(mirror_dir):
+                    log.warning(f"[{repo_identifier}] Aviso: Não foi possível gravar o espelho local {mirror_dir}: {e}")
+                    return None
+
+        _updated_mirrors.add(mirror_dir)
+        return mirror_dir
+
+
+def _clone_options(git_jobs, partial, depth, reference=None):
+    """Opções do `git clone` usado quando o gitclone não está disponível (espelha o build_clone_options dele)."""
+    options = ['--recurse-submodules', f'--jobs={git_jobs}']
+    if partial:
+        options.append('--filter=blob:none')
+    if depth:
+        # --depth implica --single-branch; --no-single-branch mantém todas as branches remotas
+        options += [f'--depth={depth}', '--no-single-branch']
+    if reference:
+        options += ['--reference-if-able', reference, '--dissociate']
+    return options
+
+
+def _clone_repository(repo_url, dest_dir, client_name, gitclone, git_identity, repo_identifier, git_jobs,
+                      partial=False, depth=None, reference_cache=None, gitclone_command=None):
+    """Clona o repositório usando o módulo gitclone, o comando gitclone (se o módulo não pôde ser importado)
+    ou git clone padrão."""
+    log.info(f"[{repo_identifier}] Clonando {repo_url} em {dest_dir} para o cliente '{client_name}'...")
+
+    # Garante que o diretório pai exista ANTES de tentar clonar (exist_ok dispensa um stat prévio)
     parent_dir = os.path.dirname(dest_dir)
-    if not os.path.isdir(parent_dir):
-        try:
-            os.makedirs(parent_dir, exist_ok=True)
-            print(f"[{repo_identifier}] Diretório pai criado: {parent_dir}")
-        except OSError as e:
-            print(f"[{repo_identifier}] Erro ao criar diretório pai {parent_dir}: {e}")
-            return False  # Não pode clonar sem o diretório pai
+    try:
+        os.makedirs(parent_dir, exist_ok=True)
+    except OSError as e:
+        log.error(f"[{repo_identifier}] Erro ao criar diretório pai {parent_dir}: {e}")
+        return False  # Não pode clonar sem o diretório pai
+
+    # Sem espelho (cache desativado ou falha ao prepará-lo), o clone é feito direto do remoto. Clones
+    # parciais/rasos também não usam o cache: o espelho completo baixaria mais do que o próprio clone
+    use_cache = reference_cache and not partial and not depth
+    reference = _ensure_cached_mirror(repo_url, reference_cache, repo_identifier) if use_cache else None
+
+    if gitclone:
+        # As mensagens do gitclone (inclusive a de falha, com comando e stderr) saem com o identificador
+        log_prefix = f"[{repo_identifier}] "
+        if not gitclone.clone_repo(repo_url, dest_dir, jobs=git_jobs, partial=partial, depth=depth,
+                                   reference=reference, log_prefix=log_prefix):
+            return False
+        if git_identity and not gitclone.apply_git_config(dest_dir, *git_identity, log_prefix=log_prefix):
+            log.warning(f"[{repo_identifier}] Aviso: Clone concluído, mas a configuração local de usuário/email falhou.")
+        return True
 
     clone_cmd_list: list[Any]
     if gitclone_command:
-        clone_cmd_list = [gitclone_command, '-c', client_name, repo_url, dest_dir]
+        # O próprio gitclone aplica o usuário/email do cliente; suas mensagens (inclusive as de erro) saem no stdout
+        clone_cmd_list = [gitclone_command, '-c', client_name, '-j', str(git_jobs)]
+        if partial:
+            clone_cmd_list.append('--partial')
+        if depth:
+            clone_cmd_list += ['--shallow', str(depth)]
+        if reference:
+            clone_cmd_list += ['--reference', reference]
+        clone_cmd_list += [repo_url, dest_dir]
+        output_options = dict(stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     else:
-        clone_cmd_list = ['git', 'clone', repo_url, dest_dir]
-
+        clone_cmd_list = [GIT, 'clone', *_clone_options(git_jobs, partial, depth, reference), repo_url, dest_dir]
+        # O git clone não escreve nada útil no stdout; só o stderr é lido, em caso de falha
+        output_options = dict(stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
     try:
-        clone_result = subprocess.run(clone_cmd_list, capture_output=True, text=True, check=True, encoding='utf-8')
-        print(f"[{repo_identifier}] Clone concluído. Saída: {clone_result.stdout.strip()}")
+        subprocess.run(clone_cmd_list, text=True, check=True, encoding='utf-8', close_fds=False, **output_options)
+        log.info(f"[{repo_identifier}] Clone concluído.")
         return True
     except subprocess.CalledProcessError as e:
-        error_output = e.stderr.strip()
-        print(f"[{repo_identifier}] Erro ao clonar o repositório {repo_url}.")
-        print(f"Comando: {' '.join(e.cmd)}")
-        print(f"Erro: {error_output}")
+        error_output = (e.stderr or e.stdout or '').strip()
+        log.error(f"[{repo_identifier}] Erro ao clonar o repositório {repo_url}.\n"
+                  f"Comando: {' '.join(e.cmd)}\n"
+                  f"Erro: {error_output}")
         return False
     except FileNotFoundError:
-        print(f"[{repo_identifier}] Erro: Comando '{clone_cmd_list[0]}' não encontrado.")
+        log.error(f"[{repo_identifier}] Erro: Comando '{clone_cmd_list[0]}' não encontrado.")
         sys.exit(1)
     except Exception as e:
-        print(f"[{repo_identifier}] Erro inesperado durante o clone: {e}")
+        log.error(f"[{repo_identifier}] Erro inesperado durante o clone: {e}")
         return False
 
 
-def _update_repository(repo_dir, repo_identifier):
+def _update_repository(repo_dir, repo_identifier, git_jobs):
     """Atualiza um repositório existente (pull)."""
-    print(f"[{repo_identifier}] Repositório já existe em {repo_dir}. Atualizando com pull...")
-    pull_result = run_git_command(repo_dir, 'pull')
+    log.info(f"[{repo_identifier}] Repositório já existe em {repo_dir}. Atualizando com pull...")
+    # O fetch do pull atualiza todas as refs remotas; com --prune, também remove as apagadas na origem
+    pull_result = run_git_command(repo_dir, 'pull', '--prune', f'--jobs={git_jobs}', capture=False)
     if pull_result.returncode != 0:
         error_msg = pull_result.stderr.strip() if hasattr(pull_result, 'stderr') else "Erro desconhecido no pull"
-        print(f"[{repo_identifier}] Aviso: Falha ao executar 'git pull'. {error_msg}")
+        log.warning(f"[{repo_identifier}] Aviso: Falha ao executar 'git pull'. {error_msg}")
         # Não adiciona ao relatório principal, pois a atualização de branches tentará de qualquer forma
         # _add_to_report(repo_identifier, 'branches-com-falha', f"Falha no pull: {error_msg}")
     return pull_result.returncode == 0
 
 
-def process_repository(repo_url, dest_dir, client_name, gitclone_command, repo_identifier, delete_gone_branches_flag):
+def _fetched_recently(repo_dir, max_age):
+    """Indica se o último fetch do repositório (mtime de .git/FETCH_HEAD) ocorreu há menos de max_age segundos."""
+    try:
+        fetch_head_mtime = os.stat(os.path.join(repo_dir, '.git', 'FETCH_HEAD')).st_mtime
+    except OSError:
+        return False
+    return time.time() - fetch_head_mtime < max_age
+
+
+def process_repository(repo_url, dest_dir, client_name, repo_identifier, gitclone, git_identities,
+                       delete_gone_branches_flag, git_jobs, max_age=0, clone_settings=None,
+                       reference_cache=None, gitclone_command=None):
     """Orquestra o clone ou atualização e a verificação de branches para um repositório."""
-    git_dir = os.path.join(dest_dir, '.git')
-    repo_exists = os.path.isdir(git_dir)
+    repo_exists = os.path.isdir(os.path.join(dest_dir, '.git'))
+
+    if repo_exists and max_age > 0 and _fetched_recently(dest_dir, max_age):
+        log.info(f"[{repo_identifier}] Último fetch há menos de {max_age}s (--max-age). Pulando atualização.")
+        return
 
     if repo_exists:
-        _update_repository(repo_dir=dest_dir, repo_identifier=repo_identifier)
-        # Sempre executa a verificação/atualização de todas as branches
+        pull_successful = _update_repository(repo_dir=dest_dir, repo_identifier=repo_identifier, git_jobs=git_jobs)
+        # Sempre executa a verificação/atualização de todas as branches; o fetch só é
+        # repetido se o pull falhou (ex.: HEAD destacado ou conflito)
         update_repository_branches(repo_dir=dest_dir, repo_identifier=repo_identifier,
-                                   delete_gone_branches_flag=delete_gone_branches_flag)
+                                   delete_gone_branches_flag=delete_gone_branches_flag, git_jobs=git_jobs,
+                                   fetch=not pull_successful)
     else:
-        clone_successful = _clone_repository(repo_url, dest_dir, client_name, gitclone_command, repo_identifier)
+        partial, depth = (clone_settings or {}).get(client_name, (False, None))
+        clone_successful = _clone_repository(repo_url, dest_dir, client_name, gitclone,
+                                             git_identities.get(client_name), repo_identifier, git_jobs,
+                                             partial=partial, depth=depth, reference_cache=reference_cache,
+                                             gitclone_command=gitclone_command)
         if clone_successful:
-            # Executa a verificação/atualização de todas as branches após o clone inicial
+            # Executa a verificação/atualização de todas as branches após o clone inicial,
+            # sem novo fetch: o clone acabou de trazer todas as refs remotas
             update_repository_branches(repo_dir=dest_dir, repo_identifier=repo_identifier,
-                                       delete_gone_branches_flag=delete_gone_branches_flag)
+                                       delete_gone_branches_flag=delete_gone_branches_flag, git_jobs=git_jobs,
+                                       fetch=False)
         # Se o clone falhou, o erro já foi reportado em _clone_repository
 
 
@@ -366,124 +685,183 @@ def processar_repo_name(repo):
 
 
 def build_repo_identifier(client_name, classe, nome_proj, grupo, repo_name):
-    return f"{client_name}/{classe}/{nome_proj}/{grupo + '/' if grupo else ''}{repo_name}"
+    return f"{client_name}/{classe}/{nome_proj}/{f'{grupo}/' if grupo else ''}{repo_name}"
 
 
-def process_repo_entry(base_url, dir_base, classe, nome_proj, grupo, repo_name, client_name, gitclone_command,
-                       delete_gone_branches_flag):
+def process_repo_entry(base_url, dest_prefix, classe, nome_proj, grupo, repo_name, client_name):
+    """Monta o item de trabalho (url, destino, cliente, identificador) de um repositório."""
     needs_slash = not base_url.endswith(('/', ':'))
     repo_url = base_url + ('/' if needs_slash else '') + repo_name
     repo_name_updated = processar_repo_name(repo_name)
 
-    parts = [dir_base, classe, nome_proj]
-    if grupo:
-        parts.append(grupo)
-    parts.append(repo_name_updated)
-    dest = os.path.abspath(os.path.join(*parts))
+    # dest_prefix já é absoluto; normpath remove '//', './' etc. vindos do subgrupo ou do nome,
+    # resultando no mesmo caminho que os.path.abspath do caminho completo
+    dest = os.path.normpath(os.path.join(dest_prefix, repo_name_updated))
 
     repo_identifier = build_repo_identifier(client_name, classe, nome_proj, grupo, repo_name_updated)
 
-    process_repository(repo_url, dest, client_name, gitclone_command, repo_identifier, delete_gone_branches_flag)
+    return repo_url, dest, client_name, repo_identifier
 
 
-def handle_repos_list(base_url, dir_base, classe, nome_proj, repos_list, client_name, gitclone_command,
-                      delete_gone_branches_flag):
-    for repo_name in repos_list:
-        process_repo_entry(base_url, dir_base, classe, nome_proj, None, repo_name, client_name, gitclone_command,
-                           delete_gone_branches_flag)
+def handle_repos_list(base_url, dir_base, classe, nome_proj, repos_list, client_name):
+    dest_prefix = os.path.abspath(os.path.join(dir_base, classe, nome_proj))
+    return [process_repo_entry(base_url, dest_prefix, classe, nome_proj, None, repo_name, client_name)
+            for repo_name in repos_list]
 
 
-def handle_repos_dict(base_url, dir_base, classe, nome_proj, repos_dict, client_name, gitclone_command,
-                      delete_gone_branches_flag):
+def handle_repos_dict(base_url, dir_base, classe, nome_proj, repos_dict, client_name):
+    project_prefix = os.path.abspath(os.path.join(dir_base, classe, nome_proj))
+    work_items = []
     for grupo, lista in repos_dict.items():
+        if not isinstance(lista, list):
+            log.warning(f"Aviso: Subgrupo '{grupo}' do projeto '{nome_proj}' não é uma lista de repositórios. Pulando.")
+            continue
+        dest_prefix = os.path.join(project_prefix, grupo)
         for repo in lista:
-            process_repo_entry(base_url, dir_base, classe, nome_proj, grupo, repo, client_name, gitclone_command,
-                               delete_gone_branches_flag)
+            work_items.append(process_repo_entry(base_url, dest_prefix, classe, nome_proj, grupo, repo, client_name))
+    return work_items
+
 
+def process_projeto(base_url, dir_base, projeto_data, client_name):
+    if not isinstance(projeto_data, dict):
+        log.warning(f"Aviso: Definição de projeto inválida para cliente '{client_name}'. Pulando: {projeto_data}")
+        return []
 
-def process_projeto(base_url, dir_base, projeto_data, client_name, gitclone_command, delete_gone_branches_flag):
     nome_proj = projeto_data.get('projeto')
     classe = projeto_data.get('classe')
     repos = projeto_data.get('repositorios')
 
     if not nome_proj or not classe or repos is None:
-        print(
+        log.warning(
             f"Aviso: Definição de projeto inválida ou incompleta para cliente '{client_name}'. Pulando: {projeto_data}")
-        return
+        return []
 
-    print(f"-- Processando Projeto: {classe}/{nome_proj} --")
+    log.info(f"-- Processando Projeto: {classe}/{nome_proj} --")
     if isinstance(repos, list):
-        handle_repos_list(base_url, dir_base, classe, nome_proj, repos, client_name, gitclone_command,
-                          delete_gone_branches_flag)
+        return handle_repos_list(base_url, dir_base, classe, nome_proj, repos, client_name)
     elif isinstance(repos, dict):
-        handle_repos_dict(base_url, dir_base, classe, nome_proj, repos, client_name, gitclone_command,
-                          delete_gone_branches_flag)
+        return handle_repos_dict(base_url, dir_base, classe, nome_proj, repos, client_name)
     else:
-        print(
+        log.warning(
             f"Aviso: Formato de 'repositorios' desconhecido para o projeto '{nome_proj}' do cliente '{client_name}'. Pulando.")
+        return []
+
 
+def process_cliente(cliente_name, cliente_data):
+    """Percorre os projetos do cliente e retorna a lista de repositórios a processar."""
+    log.info(f"=== Processando Cliente: {cliente_name} ===")
+    if not isinstance(cliente_data, dict):
+        log.error(f"Erro: Definição inválida para o cliente '{cliente_name}'. Pulando cliente.")
+        return []
 
-def process_cliente(cliente_name, cliente_data, gitclone_command, delete_gone_branches_flag):
-    print(f"=== Processando Cliente: {cliente_name} ===")
     url_base = cliente_data.get('urlBase')
     dir_base = cliente_data.get('diretorioBase')
 
     if not url_base or not dir_base:
-        print(
+        log.error(
             f"Erro: Configuração 'urlBase' ou 'diretorioBase' ausente para o cliente '{cliente_name}'. Pulando cliente.")
-        return
+        return []
 
     projetos = cliente_data.get('projetos', [])
     if not projetos:
-        print(f"Aviso: Nenhum projeto listado para o cliente '{cliente_name}'.")
-        return
+        log.warning(f"Aviso: Nenhum projeto listado para o cliente '{cliente_name}'.")
+        return []
 
+    work_items = []
     for projeto_data in projetos:
-        process_projeto(url_base, dir_base, projeto_data, cliente_name, gitclone_command, delete_gone_branches_flag)
+        work_items.extend(process_projeto(url_base, dir_base, projeto_data, cliente_name))
+    return work_items
+
+
+def build_task_list(clientes):
+    """Valida a configuração e monta, em uma única passada, a lista plana de repositórios a processar.
+
+    Toda a validação acontece aqui, antes de qualquer operação git: definições inválidas são
+    reportadas e puladas, e destinos duplicados (que seriam processados em paralelo sobre o
+    mesmo diretório) encerram a execução.
+    """
+    work_items = []
+    for cliente_name, cliente_data in clientes:
+        work_items.extend(process_cliente(cliente_name, cliente_data))
+
+    identifiers_by_dest = {}
+    for _, dest, _, repo_identifier in work_items:
+        identifiers_by_dest.setdefault(dest, []).append(repo_identifier)
+    duplicates = {dest: ids for dest, ids in identifiers_by_dest.items() if len(ids) > 1}
+    if duplicates:
+        for dest, ids in sorted(duplicates.items()):
+            log.error(f"Erro: Destino '{dest}' definido para mais de um repositório: {', '.join(ids)}")
+        sys.exit(1)
+
+    return work_items
 
 
 def _print_report():
     # Imprime o relatório final se houver algo a reportar
     if checkout_report:
-        print("\n--- Relatório de Problemas no Checkout/Atualização de Branches ---")
+        log.info("\n--- Relatório de Problemas no Checkout/Atualização de Branches ---")
         try:
-            # Ordenar chaves do relatório para consistência
-            sorted_report = {k: checkout_report[k] for k in sorted(checkout_report.keys())}
-            # Ordenar listas dentro do relatório
-            for repo_id in sorted_report:
-                if 'branches-removidas' in sorted_report[repo_id]:
-                    sorted_report[repo_id]['branches-removidas'].sort()
-                if 'branches-com-falha' in sorted_report[repo_id]:
-                    sorted_report[repo_id]['branches-com-falha'].sort()
-
-            report_json = json.dumps(sorted_report, indent=4, ensure_ascii=False)
-            print(report_json)
+            # Converter os conjuntos em listas ordenadas (as chaves são ordenadas na serialização)
+            sorted_report = {repo_id: {type: sorted(branches) for type, branches in repo_report.items()}
+                             for repo_id, repo_report in checkout_report.items()}
+
+            report_json = _dump_report(sorted_report)
+            log.info(report_json)
         except Exception as e:
-            print(f"Erro ao formatar o relatório JSON: {e}")
-            print("Dados brutos do relatório:", checkout_report)
-        print("--- Fim do Relatório ---")
+            log.error(f"Erro ao formatar o relatório JSON: {e}")
+            log.error("Dados brutos do relatório: %s", checkout_report)
+        log.info("--- Fim do Relatório ---")
     else:
-        print("\nProcessamento concluído. Nenhum problema reportado no checkout/atualização de branches.")
+        log.info("\nProcessamento concluído. Nenhum problema reportado no checkout/atualização de branches.")
 
 
 def main():
     args = parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s', stream=sys.stdout)
     config_data = load_config()
-    gitclone_command = check_gitclone_command()
+    gitclone = load_gitclone_module()
+    # Sem o módulo, um `gitclone` do PATH (ex.: um wrapper) ainda é executado como comando
+    gitclone_command = _GITCLONE_CMD if gitclone is None else None
 
     all_clientes_data = config_data.get('clientes', {})
     if not all_clientes_data:
-        print("Erro: Nenhuma seção 'clientes' encontrada no arquivo de configuração.")
+        log.error("Erro: Nenhuma seção 'clientes' encontrada no arquivo de configuração.")
         sys.exit(1)
 
     clientes_para_processar = filter_clientes(all_clientes_data, args)
 
     if not clientes_para_processar:
-        print("Nenhum cliente selecionado para processamento.")
+        log.info("Nenhum cliente selecionado para processamento.")
         sys.exit(0)
 
-    for cliente_name, cliente_data in clientes_para_processar:
-        process_cliente(cliente_name, cliente_data, gitclone_command, args.delete_gone_branches)
+    git_identities = load_git_identities(gitclone, clientes_para_processar)
+    clone_settings = load_clone_settings(clientes_para_processar, args.partial, args.shallow)
+
+    work_items = build_task_list(clientes_para_processar)
+
+    # O trabalho é dominado por I/O (rede e subprocessos git, que liberam o GIL), então threads são suficientes
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = {
+            executor.submit(process_repository, *item, gitclone=gitclone, git_identities=git_identities,
+                            delete_gone_branches_flag=args.delete_gone_branches,
+                            git_jobs=args.git_jobs, max_age=args.max_age, clone_settings=clone_settings,
+                            reference_cache=args.reference_cache, gitclone_command=gitclone_command): item
+            for item in work_items
+        }
+        try:
+            for future in as_completed(futures):
+                # Uma falha inesperada em um repositório não interrompe os demais
+                try:
+                    future.result()
+                except Exception as e:
+                    repo_identifier = futures[future][3]
+                    log.error(f"[{repo_identifier}] Erro inesperado ao processar o repositório: {e}")
+                    _add_to_report(repo_identifier, 'branches-com-falha', f"Erro inesperado: {e}")
+        except (KeyboardInterrupt, SystemExit):
+            # Ctrl-C (ou sys.exit de uma thread, ex.: git ausente): descarta os repositórios ainda na fila,
+            # em vez de deixar o `with` esperar por todos; só os que já estão em andamento terminam
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
 
     _print_report()
 